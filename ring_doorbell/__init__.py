@@ -1,21 +1,32 @@
 # coding: utf-8
 # vim:sw=4:ts=4:et:
 """Python Ring Doorbell wrapper."""
+import logging
+import threading
+import time
 try:
-    from urllib.parse import urlencode
+    from time import monotonic
 except ImportError:
-    from urllib import urlencode
+    from time import time as monotonic
 
-import logging
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# faster JSON decoding when the optional orjson package is installed
+try:
+    from orjson import loads as _json_loads
+except ImportError:
+    _json_loads = None
 
 from ring_doorbell.utils import _exists_cache, _save_cache, _read_cache
 
 from ring_doorbell.const import (
-    API_VERSION, API_URI, CACHE_ATTRS, CACHE_FILE,
-    DEVICES_ENDPOINT, HEADERS, NEW_SESSION_ENDPOINT, MSG_GENERIC_FAIL,
-    POST_DATA, PERSIST_TOKEN_ENDPOINT, PERSIST_TOKEN_DATA, RETRY_TOKEN,
-    OAUTH_ENDPOINT, OAUTH_DATA)
+    API_VERSION, CACHE_ATTRS, CACHE_FILE, CACHE_TOKEN_TTL, DEVICE_FAMILIES,
+    DEVICES_CACHE_TTL, DEVICES_ENDPOINT, HEADERS, NEW_SESSION_ENDPOINT,
+    MSG_GENERIC_FAIL, POST_DATA, PERSIST_TOKEN_ENDPOINT, PERSIST_TOKEN_DATA,
+    RETRY_BACKOFF_FACTOR, RETRY_METHODS, RETRY_STATUS_CODES, RETRY_TOKEN,
+    OAUTH_ENDPOINT, OAUTH_DATA, POOL_CONNECTIONS, POOL_MAXSIZE, TIMEOUT)
 
 from ring_doorbell.doorbot import RingDoorBell
 from ring_doorbell.chime import RingChime
@@ -30,23 +41,48 @@ class Ring(object):
 
     def __init__(self, username, password, debug=False, persist_token=False,
                  push_token_notify_url="http://localhost/", reuse_session=True,
-                 cache_file=CACHE_FILE):
+                 cache_file=CACHE_FILE, token_ttl=CACHE_TOKEN_TTL,
+                 timeout=TIMEOUT):
         """Initialize the Ring object."""
         self.is_connected = None
         self.token = None
         self.params = None
+        self._auth_lock = threading.Lock()
         self._persist_token = persist_token
         self._push_token_notify_url = push_token_notify_url
+        self._devices_cache = None
+        self._devices_cache_ts = 0
+        self._devices_index = {}
 
         self.debug = debug
         self.username = username
         self.password = password
+        self.timeout = timeout
         self.session = requests.Session()
 
+        # keep connections to the Ring API alive and pooled between calls
+        # and let urllib3 retry transient server errors with backoff
+        retry = Retry(total=RETRY_TOKEN,
+                      backoff_factor=RETRY_BACKOFF_FACTOR,
+                      status_forcelist=RETRY_STATUS_CODES,
+                      allowed_methods=RETRY_METHODS,
+                      raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS,
+                              pool_maxsize=POOL_MAXSIZE,
+                              pool_block=False,
+                              max_retries=retry)
+        self.session.mount('https://', adapter)
+
+        # the session request body never changes, so encode it only once
+        self._auth_prepared = self.session.prepare_request(
+            requests.Request('POST', NEW_SESSION_ENDPOINT,
+                             data=POST_DATA, headers=HEADERS))
+
         self.cache = CACHE_ATTRS
         self.cache['account'] = self.username
         self.cache_file = cache_file
         self._reuse_session = reuse_session
+        self._token_ttl = token_ttl
 
         # tries to re-use old session
         if self._reuse_session:
@@ -74,9 +110,18 @@ class Ring(object):
                 self.params = {'api_version': API_VERSION,
                                'auth_token': self.token}
 
+                # trust a recently issued token without validating it,
+                # self.query() re-authenticates if it gets a 401; the
+                # push token still needs to be registered when persisting
+                issued_at = self.cache['token_issued_at']
+                if not self._persist_token and issued_at is not None and \
+                   time.time() - issued_at < self._token_ttl:
+                    self.is_connected = True
+                    return
+
                 # test if token from cache_file is still valid and functional
                 # if not, it should continue to get a new auth token
-                url = API_URI + DEVICES_ENDPOINT
+                url = DEVICES_ENDPOINT
                 req = self.query(url, raw=True)
                 if req and req.status_code == 200:
                     self._authenticate(session=req)
@@ -94,74 +139,86 @@ class Ring(object):
 
         response = self.session.post(OAUTH_ENDPOINT,
                                      data=oauth_data,
-                                     headers=HEADERS)
+                                     headers=HEADERS,
+                                     timeout=self.timeout)
         oauth_token = None
         if response.status_code == 200:
             oauth_token = response.json().get('access_token')
         return oauth_token
 
-    def _authenticate(self, attempts=RETRY_TOKEN, session=None):
+    def _authenticate(self, session=None):
         """Authenticate user against Ring API."""
-        url = API_URI + NEW_SESSION_ENDPOINT
-        loop = 0
-        while loop <= attempts:
-            HEADERS['Authorization'] = \
-                'Bearer {}'.format(self._get_oauth_token())
-            loop += 1
-            try:
-                if session is None:
-                    req = self.session.post((url),
-                                            data=POST_DATA,
-                                            headers=HEADERS)
-                else:
-                    req = session
-            except requests.exceptions.RequestException as err_msg:
-                _LOGGER.error("Error!! %s", err_msg)
-                raise
-
-            if not req:
-                continue
-
-            # if token is expired, refresh credentials and try again
-            if req.status_code == 200 or req.status_code == 201:
-
-                # the only way to get a JSON with token is via POST,
-                # so we need a special conditional for 201 code
-                if req.status_code == 201:
-                    data = req.json().get('profile')
-                    self.token = data.get('authentication_token')
-
-                self.is_connected = True
-                self.params = {'api_version': API_VERSION,
-                               'auth_token': self.token}
-
-                if self._persist_token and self._push_token_notify_url:
-                    url = API_URI + PERSIST_TOKEN_ENDPOINT
-                    PERSIST_TOKEN_DATA['auth_token'] = self.token
-                    PERSIST_TOKEN_DATA['device[push_notification_token]'] = \
-                        self._push_token_notify_url
-                    req = self.session.put((url), headers=HEADERS,
-                                           data=PERSIST_TOKEN_DATA)
-
-                # update token if reuse_session is True
-                if self._reuse_session:
-                    self.cache['account'] = self.username
-                    self.cache['token'] = self.token
-                    _save_cache(self.cache, self.cache_file)
-
-                return True
+        try:
+            # the push token registration also needs the Bearer header
+            if session is None or self._persist_token:
+                HEADERS['Authorization'] = \
+                    'Bearer {}'.format(self._get_oauth_token())
+
+            if session is None:
+                prepared = self._auth_prepared.copy()
+                prepared.headers['Authorization'] = HEADERS['Authorization']
+                settings = self.session.merge_environment_settings(
+                    prepared.url, {}, None, None, None)
+                req = self.session.send(prepared, timeout=self.timeout,
+                                        **settings)
+            else:
+                req = session
+        except requests.exceptions.RequestException as err_msg:
+            _LOGGER.error("Error!! %s", err_msg)
+            raise
+
+        if req.status_code == 200 or req.status_code == 201:
+
+            # the only way to get a JSON with token is via POST,
+            # so we need a special conditional for 201 code
+            if req.status_code == 201:
+                data = req.json().get('profile')
+                self.token = data.get('authentication_token')
+                self.cache['token_issued_at'] = time.time()
+
+            self.is_connected = True
+            self.params = {'api_version': API_VERSION,
+                           'auth_token': self.token}
+
+            if self._persist_token and self._push_token_notify_url:
+                url = PERSIST_TOKEN_ENDPOINT
+                PERSIST_TOKEN_DATA['auth_token'] = self.token
+                PERSIST_TOKEN_DATA['device[push_notification_token]'] = \
+                    self._push_token_notify_url
+                req = self.session.put((url), headers=HEADERS,
+                                       data=PERSIST_TOKEN_DATA,
+                                       timeout=self.timeout)
+
+            # update token if reuse_session is True
+            if self._reuse_session:
+                self.cache['account'] = self.username
+                self.cache['token'] = self.token
+                _save_cache(self.cache, self.cache_file)
+
+            return True
 
         self.is_connected = False
         req.raise_for_status()
         return True
 
+    def _reauthenticate(self, stale_token):
+        """Refresh a rejected token once across concurrent callers."""
+        with self._auth_lock:
+            # another caller already replaced the rejected token
+            if self.is_connected and self.token != stale_token:
+                return True
+            self.is_connected = False
+            return self._authenticate()
+
     def query(self,
               url,
               attempts=RETRY_TOKEN,
               method='GET',
               raw=False,
               extra_params=None,
-              json=None):
+              json=None,
+              stream=False,
+              data=None):
         """Query data from Ring API."""
         if self.debug:
             _LOGGER.debug("Querying %s", url)
@@ -176,35 +233,38 @@ class Ring(object):
             if self.debug:
                 _LOGGER.debug("running query loop %s", loop)
 
-            # allow to override params when necessary
-            # and update self.params globally for the next connection
+            # allow to override params when necessary without
+            # leaking them into self.params for the next connection
+            params = dict(self.params)
             if extra_params:
-                params = self.params
                 params.update(extra_params)
-            else:
-                params = self.params
 
             loop += 1
+            token = self.token
             try:
-                if method == 'GET':
-                    req = self.session.get((url), params=urlencode(params))
-                elif method == 'PUT':
-                    req = self.session.put((url), params=urlencode(params))
-                elif method == 'POST':
-                    req = self.session.post(
-                        (url), params=urlencode(params), json=json)
+                req = self.session.request(method, url, params=params,
+                                           data=data, json=json,
+                                           stream=stream,
+                                           timeout=self.timeout)
 
                 if self.debug:
                     _LOGGER.debug("_query %s ret %s", loop, req.status_code)
 
+                # any write may change device attributes
+                if method != 'GET':
+                    self._devices_cache = None
+
             except requests.exceptions.RequestException as err_msg:
                 _LOGGER.error("Error!! %s", err_msg)
                 raise
 
-            # if token is expired, refresh credentials and try again
+            # if token is expired, refresh credentials and try again,
+            # transient server errors were already retried by urllib3
             if req.status_code == 401:
-                self.is_connected = False
-                self._authenticate()
+                # release the pooled connection held by a streamed body
+                if stream:
+                    req.close()
+                self._reauthenticate(token)
                 continue
 
             if req.status_code == 200 or req.status_code == 204:
@@ -213,65 +273,90 @@ class Ring(object):
                     response = req
                 else:
                     if method == 'GET':
-                        response = req.json()
-                break
+                        if _json_loads is None:
+                            response = req.json()
+                        else:
+                            response = _json_loads(req.content)
+
+            # nobody will read this streamed body, release its connection
+            if stream and response is None:
+                req.close()
+            break
 
         if self.debug and response is None:
             _LOGGER.debug("%s", MSG_GENERIC_FAIL)
         return response
 
+    def _get_devices(self, ttl=DEVICES_CACHE_TTL):
+        """Return the device list, reusing a recent response."""
+        now = monotonic()
+        if self._devices_cache and now - self._devices_cache_ts < ttl:
+            return self._devices_cache
+
+        self._devices_cache = self.query(DEVICES_ENDPOINT)
+        self._devices_cache_ts = now
+
+        # index each family by description for constant time lookups,
+        # keeping the first device when descriptions are duplicated;
+        # publish it only once fully built for concurrent readers
+        devices_index = {}
+        for family in DEVICE_FAMILIES:
+            index = devices_index[family] = {}
+            for obj in (self._devices_cache or {}).get(family) or []:
+                if obj.get('description') is not None:
+                    index.setdefault(obj['description'], obj)
+        self._devices_index = devices_index
+        return self._devices_cache
+
     @property
     def devices(self):
         """Return all devices."""
-        devs = {}
-        devs['chimes'] = self.chimes
-        devs['stickup_cams'] = self.stickup_cams
-        devs['doorbells'] = self.doorbells
-        return devs
+        return self.__devices('chimes', 'stickup_cams', 'doorbells')
 
-    def __devices(self, device_type):
-        """Private method to query devices."""
-        lst = []
-        url = API_URI + DEVICES_ENDPOINT
-        try:
-            if device_type == 'stickup_cams':
-                req = self.query(url).get('stickup_cams')
-                for member in list((obj['description'] for obj in req)):
-                    lst.append(RingStickUpCam(self, member))
-
-            if device_type == 'chimes':
-                req = self.query(url).get('chimes')
-                for member in list((obj['description'] for obj in req)):
-                    lst.append(RingChime(self, member))
-
-            if device_type == 'doorbells':
-                req = self.query(url).get('doorbots')
-                for member in list((obj['description'] for obj in req)):
-                    lst.append(RingDoorBell(self, member))
-
-                # get shared doorbells, however device is read-only
-                req = self.query(url).get('authorized_doorbots')
-                for member in list((obj['description'] for obj in req)):
-                    lst.append(RingDoorBell(self, member, shared=True))
-
-        except AttributeError:
-            pass
-        return lst
+    def __devices(self, *device_types):
+        """Private method to query devices.
+
+        The device list is fetched once and every requested family is
+        built from the same response.
+        """
+        devs = dict((device_type, []) for device_type in device_types)
+        req = self._get_devices()
+        if req is None:
+            return devs
+
+        if 'stickup_cams' in devs:
+            for attrs in req.get('stickup_cams', []):
+                devs['stickup_cams'].append(RingStickUpCam(self, attrs=attrs))
+
+        if 'chimes' in devs:
+            for attrs in req.get('chimes', []):
+                devs['chimes'].append(RingChime(self, attrs=attrs))
+
+        if 'doorbells' in devs:
+            for attrs in req.get('doorbots', []):
+                devs['doorbells'].append(RingDoorBell(self, attrs=attrs))
+
+            # get shared doorbells, however device is read-only
+            for attrs in req.get('authorized_doorbots', []):
+                devs['doorbells'].append(
+                    RingDoorBell(self, shared=True, attrs=attrs))
+
+        return devs
 
     @property
     def chimes(self):
         """Return a list of RingDoorChime objects."""
-        return self.__devices('chimes')
+        return self.__devices('chimes')['chimes']
 
     @property
     def stickup_cams(self):
         """Return a list of RingStickUpCam objects."""
-        return self.__devices('stickup_cams')
+        return self.__devices('stickup_cams')['stickup_cams']
 
     @property
     def doorbells(self):
         """Return a list of RingDoorBell objects."""
-        return self.__devices('doorbells')
+        return self.__devices('doorbells')['doorbells']
 
     def update(self):
         """Refreshes attributes for all linked devices."""
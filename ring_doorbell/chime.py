@@ -5,7 +5,7 @@ import logging
 
 from ring_doorbell.generic import RingGeneric
 from ring_doorbell.const import (
-    API_URI, CHIMES_ENDPOINT, CHIME_VOL_MIN, CHIME_VOL_MAX,
+    CHIMES_ENDPOINT, CHIME_VOL_MIN, CHIME_VOL_MAX,
     LINKED_CHIMES_ENDPOINT, MSG_VOL_OUTBOUND, TESTSOUND_CHIME_ENDPOINT,
     CHIME_TEST_SOUND_KINDS, KIND_DING, CHIME_KINDS, CHIME_PRO_KINDS)
 
@@ -15,6 +15,8 @@ _LOGGER = logging.getLogger(__name__)
 class RingChime(RingGeneric):
     """Implementation for Ring Chime."""
 
+    __slots__ = ()
+
     @property
     def family(self):
         """Return Ring device family type."""
@@ -51,7 +53,7 @@ class RingChime(RingGeneric):
         params = {
             'chime[description]': self.name,
             'chime[settings][volume]': str(value)}
-        url = API_URI + CHIMES_ENDPOINT.format(self.account_id)
+        url = CHIMES_ENDPOINT.format(self.account_id)
         self._ring.query(url, extra_params=params, method='PUT')
         self.update()
         return True
@@ -59,13 +61,13 @@ class RingChime(RingGeneric):
     @property
     def linked_tree(self):
         """Return doorbell data linked to chime."""
-        url = API_URI + LINKED_CHIMES_ENDPOINT.format(self.account_id)
+        url = LINKED_CHIMES_ENDPOINT.format(self.account_id)
         return self._ring.query(url)
 
     def test_sound(self, kind=KIND_DING):
         """Play chime to test sound."""
         if kind not in CHIME_TEST_SOUND_KINDS:
             return False
-        url = API_URI + TESTSOUND_CHIME_ENDPOINT.format(self.account_id)
+        url = TESTSOUND_CHIME_ENDPOINT.format(self.account_id)
         self._ring.query(url, method='POST', extra_params={"kind": kind})
         return True
@@ -12,8 +12,36 @@ HEADERS = {
 # number of attempts to refresh token
 RETRY_TOKEN = 3
 
+# transport level retries for transient server errors
+RETRY_BACKOFF_FACTOR = 0.3
+RETRY_METHODS = frozenset(['GET', 'PUT', 'POST'])
+RETRY_STATUS_CODES = (500, 502, 503, 504)
+
+# device list families handled by this library
+DEVICE_FAMILIES = ('chimes', 'doorbots', 'authorized_doorbots', 'stickup_cams')
+
+# seconds to reuse a fetched device list before querying it again
+DEVICES_CACHE_TTL = 5
+
+# bytes written per iteration when streaming recordings to disk
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+# number of recordings downloaded in parallel
+DOWNLOAD_WORKERS = 8
+
+# (connect, read) timeouts in seconds for every request to Ring
+TIMEOUT = (5, 10)
+
+# HTTP connection pool sizing for the shared session
+POOL_CONNECTIONS = 4
+POOL_MAXSIZE = 16
+
+# seconds a cached auth token is trusted without being validated
+CACHE_TOKEN_TTL = 3600
+
 # default suffix for session cache file
-CACHE_ATTRS = {'account': None, 'alerts': None, 'token': None}
+CACHE_ATTRS = {'account': None, 'alerts': None, 'token': None,
+               'token_issued_at': None}
 
 try:
     CACHE_FILE = os.path.join(os.getenv("HOME"),
@@ -29,25 +57,25 @@ NOT_FOUND = -1
 OAUTH_ENDPOINT = 'https://oauth.ring.com/oauth/token'
 API_VERSION = '9'
 API_URI = 'https://api.ring.com'
-CHIMES_ENDPOINT = '/clients_api/chimes/{0}'
-DEVICES_ENDPOINT = '/clients_api/ring_devices'
-DINGS_ENDPOINT = '/clients_api/dings/active'
-DOORBELLS_ENDPOINT = '/clients_api/doorbots/{0}'
-PERSIST_TOKEN_ENDPOINT = '/clients_api/device'
+CHIMES_ENDPOINT = API_URI + '/clients_api/chimes/{0}'
+DEVICES_ENDPOINT = API_URI + '/clients_api/ring_devices'
+DINGS_ENDPOINT = API_URI + '/clients_api/dings/active'
+DOORBELLS_ENDPOINT = API_URI + '/clients_api/doorbots/{0}'
+PERSIST_TOKEN_ENDPOINT = API_URI + '/clients_api/device'
 
 HEALTH_DOORBELL_ENDPOINT = DOORBELLS_ENDPOINT + '/health'
 HEALTH_CHIMES_ENDPOINT = CHIMES_ENDPOINT + '/health'
 LIGHTS_ENDPOINT = DOORBELLS_ENDPOINT + '/floodlight_light_{1}'
 LINKED_CHIMES_ENDPOINT = CHIMES_ENDPOINT + '/linked_doorbots'
 LIVE_STREAMING_ENDPOINT = DOORBELLS_ENDPOINT + '/vod'
-NEW_SESSION_ENDPOINT = '/clients_api/session'
-RINGTONES_ENDPOINT = '/ringtones'
+NEW_SESSION_ENDPOINT = API_URI + '/clients_api/session'
+RINGTONES_ENDPOINT = API_URI + '/ringtones'
 SIREN_ENDPOINT = DOORBELLS_ENDPOINT + '/siren_{1}'
-SNAPSHOT_ENDPOINT = "/clients_api/snapshots/image/{0}"
-SNAPSHOT_TIMESTAMP_ENDPOINT = "/clients_api/snapshots/timestamps"
+SNAPSHOT_ENDPOINT = API_URI + "/clients_api/snapshots/image/{0}"
+SNAPSHOT_TIMESTAMP_ENDPOINT = API_URI + "/clients_api/snapshots/timestamps"
 TESTSOUND_CHIME_ENDPOINT = CHIMES_ENDPOINT + '/play_sound'
 URL_DOORBELL_HISTORY = DOORBELLS_ENDPOINT + '/history'
-URL_RECORDING = '/clients_api/dings/{0}/recording'
+URL_RECORDING = API_URI + '/clients_api/dings/{0}/recording'
 
 # chime test sound kinds
 KIND_DING = 'ding'
@@ -2,23 +2,37 @@
 # vim:sw=4:ts=4:et:
 """Python Ring Doorbell wrapper."""
 import logging
-from datetime import datetime
 import os
+import tempfile
+import threading
 import time
-import pytz
+from datetime import datetime
+
+# prefer the stdlib timezone support, pytz is only needed before 3.9
+try:
+    from datetime import timezone as _tz
+    from zoneinfo import ZoneInfo as _zone_info
+    _UTC = _tz.utc
+except ImportError:
+    from pytz import timezone as _zone_info, utc as _UTC
+
+try:
+    from queue import Queue, Empty
+except ImportError:
+    from Queue import Queue, Empty
 
 
 from ring_doorbell.generic import RingGeneric
 
-from ring_doorbell.utils import _save_cache
+from ring_doorbell.utils import _replace, _save_cache
 from ring_doorbell.const import (
-    API_URI, DOORBELLS_ENDPOINT, DOORBELL_VOL_MIN, DOORBELL_VOL_MAX,
+    DOORBELLS_ENDPOINT, DOORBELL_VOL_MIN, DOORBELL_VOL_MAX,
     DOORBELL_EXISTING_TYPE, DINGS_ENDPOINT, DOORBELL_KINDS,
     DOORBELL_2_KINDS, DOORBELL_PRO_KINDS, DOORBELL_ELITE_KINDS,
-    FILE_EXISTS, LIVE_STREAMING_ENDPOINT, MSG_BOOLEAN_REQUIRED,
-    MSG_EXISTING_TYPE, MSG_VOL_OUTBOUND, SNAPSHOT_ENDPOINT,
-    SNAPSHOT_TIMESTAMP_ENDPOINT, URL_DOORBELL_HISTORY,
-    URL_RECORDING)
+    DOWNLOAD_CHUNK_SIZE, DOWNLOAD_WORKERS, FILE_EXISTS,
+    LIVE_STREAMING_ENDPOINT, MSG_BOOLEAN_REQUIRED, MSG_EXISTING_TYPE,
+    MSG_VOL_OUTBOUND, SNAPSHOT_ENDPOINT, SNAPSHOT_TIMESTAMP_ENDPOINT,
+    URL_DOORBELL_HISTORY, URL_RECORDING)
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -26,6 +40,8 @@ _LOGGER = logging.getLogger(__name__)
 class RingDoorBell(RingGeneric):
     """Implementation for Ring Doorbell."""
 
+    __slots__ = ()
+
     @property
     def family(self):
         """Return Ring device family type."""
@@ -76,7 +92,7 @@ class RingDoorBell(RingGeneric):
 
     def check_alerts(self):
         """Return JSON when motion or ring is detected."""
-        url = API_URI + DINGS_ENDPOINT
+        url = DINGS_ENDPOINT
         self.update()
 
         try:
@@ -95,6 +111,11 @@ class RingDoorBell(RingGeneric):
             return True
         return None
 
+    def _chime_settings(self):
+        """Return the existing doorbell chime settings."""
+        settings = self._attrs.get('settings') or {}
+        return settings.get('chime_settings') or {}
+
     @property
     def existing_doorbell_type(self):
         """
@@ -104,11 +125,7 @@ class RingDoorBell(RingGeneric):
         1: Digital
         2: Not Present
         """
-        try:
-            return DOORBELL_EXISTING_TYPE[
-                self._attrs.get('settings').get('chime_settings').get('type')]
-        except AttributeError:
-            return None
+        return DOORBELL_EXISTING_TYPE.get(self._chime_settings().get('type'))
 
     @existing_doorbell_type.setter
     def existing_doorbell_type(self, value):
@@ -119,14 +136,14 @@ class RingDoorBell(RingGeneric):
         1: Digital
         2: Not Present
         """
-        if value not in DOORBELL_EXISTING_TYPE.keys():
+        if value not in DOORBELL_EXISTING_TYPE:
             _LOGGER.error("%s", MSG_EXISTING_TYPE)
             return False
         params = {
             'doorbot[description]': self.name,
             'doorbot[settings][chime_settings][type]': value}
         if self.existing_doorbell_type:
-            url = API_URI + DOORBELLS_ENDPOINT.format(self.account_id)
+            url = DOORBELLS_ENDPOINT.format(self.account_id)
             self._ring.query(url, extra_params=params, method='PUT')
             self.update()
             return True
@@ -135,29 +152,30 @@ class RingDoorBell(RingGeneric):
     @property
     def existing_doorbell_type_enabled(self):
         """Return if existing doorbell type is enabled."""
-        if self.existing_doorbell_type:
-            if self.existing_doorbell_type == DOORBELL_EXISTING_TYPE[2]:
+        existing_type = self.existing_doorbell_type
+        if existing_type:
+            if existing_type == DOORBELL_EXISTING_TYPE[2]:
                 return None
-            return \
-                self._attrs.get('settings').get('chime_settings').get('enable')
+            return self._chime_settings().get('enable')
         return False
 
     @existing_doorbell_type_enabled.setter
     def existing_doorbell_type_enabled(self, value):
         """Enable/disable the existing doorbell if Digital/Mechanical."""
-        if self.existing_doorbell_type:
+        existing_type = self.existing_doorbell_type
+        if existing_type:
 
             if not isinstance(value, bool):
                 _LOGGER.error("%s", MSG_BOOLEAN_REQUIRED)
                 return None
 
-            if self.existing_doorbell_type == DOORBELL_EXISTING_TYPE[2]:
+            if existing_type == DOORBELL_EXISTING_TYPE[2]:
                 return None
 
             params = {
                 'doorbot[description]': self.name,
                 'doorbot[settings][chime_settings][enable]': value}
-            url = API_URI + DOORBELLS_ENDPOINT.format(self.account_id)
+            url = DOORBELLS_ENDPOINT.format(self.account_id)
             self._ring.query(url, extra_params=params, method='PUT')
             self.update()
             return True
@@ -166,16 +184,15 @@ class RingDoorBell(RingGeneric):
     @property
     def existing_doorbell_type_duration(self):
         """Return duration for Digital chime."""
-        if self.existing_doorbell_type:
-            if self.existing_doorbell_type == DOORBELL_EXISTING_TYPE[1]:
-                return self._attrs.get('settings').\
-                       get('chime_settings').get('duration')
+        if self.existing_doorbell_type == DOORBELL_EXISTING_TYPE[1]:
+            return self._chime_settings().get('duration')
         return None
 
     @existing_doorbell_type_duration.setter
     def existing_doorbell_type_duration(self, value):
         """Set duration for Digital chime."""
-        if self.existing_doorbell_type:
+        existing_type = self.existing_doorbell_type
+        if existing_type:
 
             if not ((isinstance(value, int)) and
                     (DOORBELL_VOL_MIN <= value <= DOORBELL_VOL_MAX)):
@@ -183,11 +200,11 @@ class RingDoorBell(RingGeneric):
                                                             DOORBELL_VOL_MAX))
                 return False
 
-            if self.existing_doorbell_type == DOORBELL_EXISTING_TYPE[1]:
+            if existing_type == DOORBELL_EXISTING_TYPE[1]:
                 params = {
                     'doorbot[description]': self.name,
                     'doorbot[settings][chime_settings][duration]': value}
-                url = API_URI + DOORBELLS_ENDPOINT.format(self.account_id)
+                url = DOORBELLS_ENDPOINT.format(self.account_id)
                 self._ring.query(url, extra_params=params, method='PUT')
                 self.update()
                 return True
@@ -212,12 +229,16 @@ class RingDoorBell(RingGeneric):
         if retry > 10:
             retry = 10
 
+        # convert for specific timezone
+        if timezone:
+            mytz = _zone_info(timezone)
+
         while True:
             params = {'limit': str(limit)}
             if older_than:
                 params['older_than'] = older_than
 
-            url = API_URI + URL_DOORBELL_HISTORY.format(self.account_id)
+            url = URL_DOORBELL_HISTORY.format(self.account_id)
             response = self._ring.query(url, extra_params=params)
 
             # cherrypick only the selected kind events
@@ -225,20 +246,12 @@ class RingDoorBell(RingGeneric):
                 response = list(filter(
                     lambda array: array['kind'] == kind, response))
 
-            # convert for specific timezone
-            utc = pytz.utc
-            if timezone:
-                mytz = pytz.timezone(timezone)
-
             for entry in response:
-                dt_at = datetime.strptime(entry['created_at'],
-                                          '%Y-%m-%dT%H:%M:%S.000Z')
-                utc_dt = datetime(dt_at.year, dt_at.month, dt_at.day,
-                                  dt_at.hour, dt_at.minute, dt_at.second,
-                                  tzinfo=utc)
+                utc_dt = datetime.strptime(
+                    entry['created_at'],
+                    '%Y-%m-%dT%H:%M:%S.000Z').replace(tzinfo=_UTC)
                 if timezone:
-                    tz_dt = utc_dt.astimezone(mytz)
-                    entry['created_at'] = tz_dt
+                    entry['created_at'] = utc_dt.astimezone(mytz)
                 else:
                     entry['created_at'] = utc_dt
 
@@ -274,10 +287,10 @@ class RingDoorBell(RingGeneric):
     @property
     def live_streaming_json(self):
         """Return JSON for live streaming."""
-        url = API_URI + LIVE_STREAMING_ENDPOINT.format(self.account_id)
+        url = LIVE_STREAMING_ENDPOINT.format(self.account_id)
         req = self._ring.query((url), method='POST', raw=True)
         if req and req.status_code == 204:
-            url = API_URI + DINGS_ENDPOINT
+            url = DINGS_ENDPOINT
             try:
                 return self._ring.query(url)[0]
             except (IndexError, TypeError):
@@ -291,26 +304,92 @@ class RingDoorBell(RingGeneric):
             _LOGGER.warning(msg)
             return False
 
-        url = API_URI + URL_RECORDING.format(recording_id)
+        url = URL_RECORDING.format(recording_id)
         try:
-            req = self._ring.query(url, raw=True)
-            if req and req.status_code == 200:
-
-                if filename:
-                    if os.path.isfile(filename) and not override:
-                        _LOGGER.error("%s", FILE_EXISTS.format(filename))
-                        return False
+            req = self._ring.query(url, raw=True, stream=True)
+            if req is None:
+                return False
 
-                    with open(filename, 'wb') as recording:
-                        recording.write(req.content)
+            # always release the streamed connection back to the pool
+            try:
+                if req.status_code == 200:
+
+                    if filename:
+                        if os.path.isfile(filename) and not override:
+                            _LOGGER.error("%s", FILE_EXISTS.format(filename))
+                            return False
+
+                        # stream into a temporary file so an interrupted
+                        # transfer never leaves a truncated recording behind
+                        fd, tmp_filename = tempfile.mkstemp(
+                            suffix='.tmp',
+                            dir=os.path.dirname(filename) or '.')
+                        try:
+                            with os.fdopen(fd, 'wb') as recording:
+                                for chunk in req.iter_content(
+                                        DOWNLOAD_CHUNK_SIZE):
+                                    recording.write(chunk)
+                            _replace(tmp_filename, filename)
+                        except Exception:
+                            os.remove(tmp_filename)
+                            raise
                         return True
-                else:
-                    return req.content
+                    else:
+                        return req.content
+            finally:
+                req.close()
         except IOError as error:
             _LOGGER.error("%s", error)
             raise
         return False
 
+    def recording_download_many(self, recording_ids, directory='.',
+                                override=False, workers=DOWNLOAD_WORKERS):
+        """
+        Save several recordings in MP4 format to a directory in parallel.
+
+        :param recording_ids: recording IDs to download
+        :param directory: where to save the recordings as <id>.mp4
+        :param override: when True, overwrite existing files
+        :param workers: max number of simultaneous downloads
+        """
+        # queue each recording once so no two threads write the same file
+        pending = Queue()
+        queued = set()
+        for recording_id in recording_ids:
+            if recording_id not in queued:
+                queued.add(recording_id)
+                pending.put(recording_id)
+
+        results = {}
+
+        def download():
+            """Download recordings until none are left."""
+            while True:
+                try:
+                    recording_id = pending.get_nowait()
+                except Empty:
+                    return
+
+                # never let one failure kill the worker and drop its IDs
+                # pylint: disable=broad-except
+                try:
+                    filename = os.path.join(
+                        directory, '{0}.mp4'.format(recording_id))
+                    results[recording_id] = self.recording_download(
+                        recording_id, filename=filename, override=override)
+                except Exception as error:
+                    _LOGGER.error("%s", error)
+                    results[recording_id] = False
+
+        threads = [threading.Thread(target=download)
+                   for _ in range(min(max(workers, 1), pending.qsize()))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
     def recording_url(self, recording_id):
         """Return HTTPS recording URL."""
         if not self.has_subscription:
@@ -318,7 +397,7 @@ class RingDoorBell(RingGeneric):
             _LOGGER.warning(msg)
             return False
 
-        url = API_URI + URL_RECORDING.format(recording_id)
+        url = URL_RECORDING.format(recording_id)
         req = self._ring.query(url, raw=True)
         if req and req.status_code == 200:
             return req.url
@@ -327,23 +406,18 @@ class RingDoorBell(RingGeneric):
     @property
     def subscribed(self):
         """Return if is online."""
-        result = self._attrs.get('subscribed')
-        if result is None:
-            return False
-        return True
+        return self._attrs.get('subscribed') is not None
 
     @property
     def subscribed_motion(self):
         """Return if is subscribed_motion."""
-        result = self._attrs.get('subscribed_motions')
-        if result is None:
-            return False
-        return True
+        return self._attrs.get('subscribed_motions') is not None
 
     @property
     def has_subscription(self):
         """Return boolean if the account has subscription."""
-        return self._attrs.get('features').get('show_recordings')
+        features = self._attrs.get('features') or {}
+        return features.get('show_recordings')
 
     @property
     def volume(self):
@@ -361,7 +435,7 @@ class RingDoorBell(RingGeneric):
         params = {
             'doorbot[description]': self.name,
             'doorbot[settings][doorbell_volume]': str(value)}
-        url = API_URI + DOORBELLS_ENDPOINT.format(self.account_id)
+        url = DOORBELLS_ENDPOINT.format(self.account_id)
         self._ring.query(url, extra_params=params, method='PUT')
         self.update()
         return True
@@ -373,7 +447,7 @@ class RingDoorBell(RingGeneric):
 
     def get_snapshot(self, retries=3, delay=1):
         """Take a snapshot and download it"""
-        url = API_URI + SNAPSHOT_TIMESTAMP_ENDPOINT
+        url = SNAPSHOT_TIMESTAMP_ENDPOINT
         payload = {"doorbot_ids": [self._attrs.get('id')]}
         self._ring.query(url, json=payload)
         request_time = time.time()
@@ -382,6 +456,6 @@ class RingDoorBell(RingGeneric):
             response = self._ring.query(
                 url, method="POST", json=payload, raw=1).json()
             if response["timestamps"][0]["timestamp"] / 1000 > request_time:
-                return self._ring.query(API_URI + SNAPSHOT_ENDPOINT.format(
+                return self._ring.query(SNAPSHOT_ENDPOINT.format(
                     self._attrs.get('id')), raw=True).content
         return False
@@ -4,9 +4,8 @@
 import logging
 from datetime import datetime
 
-from ring_doorbell.utils import _locator, _save_cache
+from ring_doorbell.utils import _save_cache
 from ring_doorbell.const import (
-    API_URI, DEVICES_ENDPOINT, NOT_FOUND,
     HEALTH_CHIMES_ENDPOINT, HEALTH_DOORBELL_ENDPOINT)
 
 _LOGGER = logging.getLogger(__name__)
@@ -16,7 +15,10 @@ _LOGGER = logging.getLogger(__name__)
 class RingGeneric(object):
     """Generic Implementation for Ring Chime/Doorbell."""
 
-    def __init__(self, ring, name, shared=False):
+    __slots__ = ('_ring', 'debug', 'name', 'shared', '_attrs',
+                 '_health_attrs', 'alert_expires_at')
+
+    def __init__(self, ring, name=None, shared=False, attrs=None):
         """Initialize Ring Generic."""
         self._ring = ring
         self.debug = self._ring.debug
@@ -28,8 +30,15 @@ class RingGeneric(object):
         # alerts notifications
         self.alert_expires_at = None
 
-        # force update
-        self.update()
+        # reuse attributes already fetched by the caller
+        if attrs is not None:
+            self._attrs = attrs
+            self.name = attrs.get('description')
+            self._get_health_attrs()
+            self._update_alert()
+        else:
+            # force update
+            self.update()
 
     def __repr__(self):
         """Return __repr__."""
@@ -78,27 +87,26 @@ class RingGeneric(object):
 
     def _get_attrs(self):
         """Return attributes."""
-        url = API_URI + DEVICES_ENDPOINT
-        try:
-            if self.family == 'doorbots' and self.shared:
-                lst = self._ring.query(url).get('authorized_doorbots')
-            else:
-                lst = self._ring.query(url).get(self.family)
-            index = _locator(lst, 'description', self.name)
-            if index == NOT_FOUND:
-                return None
-        except AttributeError:
+        # pylint: disable=protected-access
+        self._ring._get_devices()
+        if self.family == 'doorbots' and self.shared:
+            family = 'authorized_doorbots'
+        else:
+            family = self.family
+
+        attrs = self._ring._devices_index.get(family, {}).get(self.name)
+        if attrs is None:
             return None
 
-        self._attrs = lst[index]
+        self._attrs = attrs
         return True
 
     def _get_health_attrs(self):
         """Return health attributes."""
         if self.family == 'doorbots' or self.family == 'stickup_cams':
-            url = API_URI + HEALTH_DOORBELL_ENDPOINT.format(self.account_id)
+            url = HEALTH_DOORBELL_ENDPOINT.format(self.account_id)
         elif self.family == 'chimes':
-            url = API_URI + HEALTH_CHIMES_ENDPOINT.format(self.account_id)
+            url = HEALTH_CHIMES_ENDPOINT.format(self.account_id)
         self._health_attrs = self._ring.query(url).get('device_health')
 
     @property
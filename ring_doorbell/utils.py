@@ -2,6 +2,7 @@
 # vim:sw=4:ts=4:et:
 """Python Ring Doorbell utils."""
 import os
+import tempfile
 from ring_doorbell.const import CACHE_ATTRS, NOT_FOUND
 
 try:
@@ -9,6 +10,11 @@ try:
 except ImportError:
     import pickle
 
+try:
+    _replace = os.replace
+except AttributeError:
+    _replace = os.rename
+
 
 def _locator(lst, key, value):
     """Return the position of a match item in list."""
@@ -37,8 +43,18 @@ def _exists_cache(filename):
 
 def _save_cache(data, filename):
     """Dump data into a pickle file."""
-    with open(filename, 'wb') as pickle_db:
-        pickle.dump(data, pickle_db)
+    # write to a unique temporary file first so readers never see a
+    # partial cache and concurrent writers never share the same file
+    fd, tmp_filename = tempfile.mkstemp(
+        prefix=os.path.basename(filename) + '.', suffix='.tmp',
+        dir=os.path.dirname(filename) or '.')
+    try:
+        with os.fdopen(fd, 'wb') as pickle_db:
+            pickle.dump(data, pickle_db)
+        _replace(tmp_filename, filename)
+    except Exception:
+        os.remove(tmp_filename)
+        raise
     return True
 
 
@@ -22,7 +22,12 @@ setup(
     url='https://github.com/tchellomello/python-ring-doorbell',
     license='LGPLv3+',
     include_package_data=True,
-    install_requires=['requests', 'pytz'],
+    install_requires=[
+        'requests',
+        'pytz; python_version < "3.9"',
+        'tzdata; python_version >= "3.9" and sys_platform == "win32"',
+        'urllib3>=1.26'],
+    extras_require={'orjson': ['orjson']},
     test_suite='tests',
     keywords=[
         'ring',
@@ -1,9 +1,17 @@
 # -*- coding: utf-8 -*-
 """The tests for the Ring platform."""
+import json
+import os
+import shutil
+import tempfile
+import time
 from datetime import datetime
-from tests.test_base import RingUnitTestBase
+from tests.test_base import RingUnitTestBase, USERNAME, PASSWORD, CACHE
 from tests.helpers import load_fixture
+from ring_doorbell.utils import _save_cache
 import requests_mock
+from requests.exceptions import ChunkedEncodingError
+from mock import patch
 
 
 class TestRing(RingUnitTestBase):
@@ -31,6 +39,194 @@ class TestRing(RingUnitTestBase):
         self.assertFalse(data._persist_token)
         self.assertEqual('http://localhost/', data._push_token_notify_url)
 
+    @requests_mock.Mocker()
+    def test_reuse_cached_token(self, mock):
+        """Test a recently issued token is reused without any request."""
+        from ring_doorbell import Ring
+        _save_cache({'account': USERNAME, 'alerts': None, 'token': 'abc',
+                     'token_issued_at': time.time()}, CACHE)
+
+        data = Ring(USERNAME, PASSWORD, cache_file=CACHE)
+        self.assertTrue(data.is_connected)
+        self.assertEqual('abc', data.token)
+        self.assertEqual(0, len(mock.request_history))
+
+    @requests_mock.Mocker()
+    def test_validate_expired_cached_token(self, mock):
+        """Test an old token is validated even if the cache was rewritten."""
+        from ring_doorbell import Ring
+        mock.get('https://api.ring.com/clients_api/ring_devices',
+                 text=load_fixture('ring_devices.json'))
+        _save_cache({'account': USERNAME, 'alerts': None, 'token': 'abc',
+                     'token_issued_at': time.time() - 7200}, CACHE)
+
+        data = Ring(USERNAME, PASSWORD, cache_file=CACHE)
+        self.assertTrue(data.is_connected)
+        self.assertEqual('abc', data.token)
+        self.assertEqual(1, len(mock.request_history))
+
+    @requests_mock.Mocker()
+    def test_persist_cached_token(self, mock):
+        """Test a cached token is still registered for push notifications."""
+        from ring_doorbell import Ring
+        mock.get('https://api.ring.com/clients_api/ring_devices',
+                 text=load_fixture('ring_devices.json'))
+        mock.post('https://oauth.ring.com/oauth/token',
+                  text=load_fixture('ring_oauth.json'))
+        mock.put('https://api.ring.com/clients_api/device',
+                 text=load_fixture('ring_devices.json'))
+        _save_cache({'account': USERNAME, 'alerts': None, 'token': 'abc',
+                     'token_issued_at': time.time()}, CACHE)
+
+        data = Ring(USERNAME, PASSWORD, cache_file=CACHE, persist_token=True)
+        self.assertTrue(data.is_connected)
+        puts = [req for req in mock.request_history if req.method == 'PUT']
+        self.assertEqual(1, len(puts))
+        self.assertEqual('/clients_api/device', puts[0].path)
+        self.assertIn('auth_token=abc', puts[0].text)
+        self.assertTrue(puts[0].headers['Authorization'].startswith('Bearer '))
+        self.assertNotEqual('Bearer None', puts[0].headers['Authorization'])
+
+    @requests_mock.Mocker()
+    def test_query_reauthenticate(self, mock):
+        """Test a 401 refreshes the token once and retries the query."""
+        mock.get('https://api.ring.com/clients_api/ring_devices',
+                 [{'status_code': 401},
+                  {'text': load_fixture('ring_devices.json')}])
+        mock.post('https://oauth.ring.com/oauth/token',
+                  text=load_fixture('ring_oauth.json'))
+        mock.post('https://api.ring.com/clients_api/session',
+                  text=load_fixture('ring_session.json'))
+
+        data = self.ring
+        response = data.query('https://api.ring.com/clients_api/ring_devices')
+        self.assertIn('chimes', response)
+        self.assertTrue(data.is_connected)
+        sessions = [req for req in mock.request_history
+                    if req.path == '/clients_api/session']
+        self.assertEqual(1, len(sessions))
+        self.assertIn('api_version=9', sessions[0].text)
+        self.assertTrue(
+            sessions[0].headers['Authorization'].startswith('Bearer '))
+
+    def test_transport_retries(self):
+        """Test transient server errors are retried by urllib3."""
+        adapter = self.ring.session.get_adapter('https://api.ring.com')
+        self.assertEqual(3, adapter.max_retries.total)
+        self.assertIn(503, adapter.max_retries.status_forcelist)
+
+    @requests_mock.Mocker()
+    def test_query_server_error(self, mock):
+        """Test a failed query is not repeated by query itself."""
+        mock.get('https://api.ring.com/clients_api/ring_devices',
+                 status_code=404)
+
+        data = self.ring
+        self.assertIsNone(
+            data.query('https://api.ring.com/clients_api/ring_devices'))
+        self.assertEqual(1, len(mock.request_history))
+
+    @requests_mock.Mocker()
+    def test_query_json_fallback(self, mock):
+        """Test responses are decoded without the optional orjson."""
+        mock.get('https://api.ring.com/clients_api/ring_devices',
+                 text=load_fixture('ring_devices.json'))
+
+        data = self.ring
+        with patch('ring_doorbell._json_loads', None):
+            response = data.query(
+                'https://api.ring.com/clients_api/ring_devices')
+        self.assertEqual(response, data.query(
+            'https://api.ring.com/clients_api/ring_devices'))
+        self.assertIn('chimes', response)
+
+    @requests_mock.Mocker()
+    def test_query_stream_release(self, mock):
+        """Test discarded streamed responses are closed."""
+        url = 'https://api.ring.com/clients_api/dings/12345/recording'
+        mock.get(url, [{'status_code': 401},
+                       {'content': b'mp4 data'},
+                       {'status_code': 404}])
+        mock.post('https://oauth.ring.com/oauth/token',
+                  text=load_fixture('ring_oauth.json'))
+        mock.post('https://api.ring.com/clients_api/session',
+                  text=load_fixture('ring_session.json'))
+
+        data = self.ring
+        with patch('requests.models.Response.close') as close:
+            req = data.query(url, raw=True, stream=True)
+            self.assertEqual(200, req.status_code)
+            self.assertEqual(1, close.call_count)
+
+            self.assertIsNone(data.query(url, raw=True, stream=True))
+            self.assertEqual(2, close.call_count)
+
+    @requests_mock.Mocker()
+    def test_query_request_body(self, mock):
+        """Test query forwards a request body for any method."""
+        mock.put('https://api.ring.com/clients_api/doorbots/987652',
+                 status_code=204)
+
+        data = self.ring
+        req = data.query('https://api.ring.com/clients_api/doorbots/987652',
+                         method='PUT', raw=True, data={'foo': 'bar'})
+        self.assertEqual(204, req.status_code)
+        self.assertEqual('foo=bar', mock.last_request.text)
+        self.assertEqual((5, 10), mock.last_request.timeout)
+
+    @requests_mock.Mocker()
+    def test_reauthenticate_already_refreshed(self, mock):
+        """Test a stale 401 does not refresh an already replaced token."""
+        data = self.ring
+        data.token = 'new'
+        data.is_connected = True
+        self.assertTrue(data._reauthenticate('old'))
+        self.assertEqual('new', data.token)
+        self.assertEqual(0, len(mock.request_history))
+
+    @requests_mock.Mocker()
+    def test_devices(self, mock):
+        """Test all device families are built from a single query."""
+        mock.get('https://api.ring.com/clients_api/ring_devices',
+                 text=load_fixture('ring_devices.json'))
+        mock.get('https://api.ring.com/clients_api/chimes/999999/health',
+                 text=load_fixture('ring_chime_health_attrs.json'))
+        mock.get('https://api.ring.com/clients_api/doorbots/987652/health',
+                 text=load_fixture('ring_doorboot_health_attrs.json'))
+        mock.get('https://api.ring.com/clients_api/doorbots/987653/health',
+                 text=load_fixture('ring_doorboot_health_attrs_id987653.json'))
+
+        devices = self.ring.devices
+        self.assertEqual(['chimes', 'doorbells', 'stickup_cams'],
+                         sorted(devices.keys()))
+        self.assertEqual(1, len(devices['chimes']))
+        self.assertEqual(2, len(devices['doorbells']))
+        self.assertEqual(1, len(devices['stickup_cams']))
+        for device_lst in devices.values():
+            for dev in device_lst:
+                self.assertFalse(hasattr(dev, '__dict__'))
+
+        # device list is fetched once and reused by every device
+        queries = [req for req in mock.request_history
+                   if req.path == '/clients_api/ring_devices']
+        self.assertEqual(1, len(queries))
+
+    @requests_mock.Mocker()
+    def test_devices_unknown_family(self, mock):
+        """Test unrelated device families do not break lookups."""
+        devices = json.loads(load_fixture('ring_devices.json'))
+        devices['base_stations'] = [{'id': 1}]
+        mock.get('https://api.ring.com/clients_api/ring_devices',
+                 text=json.dumps(devices))
+        mock.get('https://api.ring.com/clients_api/chimes/999999/health',
+                 text=load_fixture('ring_chime_health_attrs.json'))
+
+        chimes = self.ring.chimes
+        self.assertEqual(1, len(chimes))
+        chimes[0].update()
+        self.assertEqual('Downstairs', chimes[0].name)
+        self.assertEqual(999999, chimes[0].account_id)
+
     @requests_mock.Mocker()
     def test_chime_attributes(self, mock):
         """Test the Ring Chime class and methods."""
@@ -56,6 +252,20 @@ class TestRing(RingUnitTestBase):
         self.assertEqual('good', dev.wifi_signal_category)
         self.assertNotEqual(100, dev.wifi_signal_strength)
 
+    @requests_mock.Mocker()
+    def test_chime_by_name(self, mock):
+        """Test a device can still be looked up by its name."""
+        from ring_doorbell import RingChime
+        mock.get('https://api.ring.com/clients_api/ring_devices',
+                 text=load_fixture('ring_devices.json'))
+        mock.get('https://api.ring.com/clients_api/chimes/999999/health',
+                 text=load_fixture('ring_chime_health_attrs.json'))
+
+        dev = RingChime(self.ring, 'Downstairs')
+        self.assertEqual('Downstairs', dev.name)
+        self.assertEqual(999999, dev.account_id)
+        self.assertEqual('ring_mock_wifi', dev.wifi_name)
+
     @requests_mock.Mocker()
     def test_doorbell_attributes(self, mock):
         mock.get('https://api.ring.com/clients_api/ring_devices',
@@ -81,6 +291,8 @@ class TestRing(RingUnitTestBase):
                 self.assertEqual('America/New_York', dev.timezone)
                 self.assertEqual(1, dev.volume)
                 self.assertTrue(dev.has_subscription)
+                self.assertTrue(dev.subscribed)
+                self.assertTrue(dev.subscribed_motion)
                 self.assertEqual('online', dev.connection_status)
 
                 self.assertIsInstance(dev.history(limit=1, kind='motion'),
@@ -92,11 +304,130 @@ class TestRing(RingUnitTestBase):
                                                     retry=50)))
 
                 self.assertEqual('Mechanical', dev.existing_doorbell_type)
+                self.assertTrue(dev.existing_doorbell_type_enabled)
+                self.assertIsNone(dev.existing_doorbell_type_duration)
                 self.assertTrue(data._persist_token)
                 self.assertEqual('ring_mock_wifi', dev.wifi_name)
                 self.assertEqual('good', dev.wifi_signal_category)
                 self.assertEqual(-58, dev.wifi_signal_strength)
 
+    @requests_mock.Mocker()
+    def test_doorbell_history_timezone(self, mock):
+        """Test history timestamps are timezone aware."""
+        mock.get('https://api.ring.com/clients_api/ring_devices',
+                 text=load_fixture('ring_devices.json'))
+        mock.get('https://api.ring.com/clients_api/doorbots/987652/history',
+                 text=load_fixture('ring_doorbots.json'))
+        mock.get('https://api.ring.com/clients_api/doorbots/987652/health',
+                 text=load_fixture('ring_doorboot_health_attrs.json'))
+        mock.get('https://api.ring.com/clients_api/doorbots/987653/health',
+                 text=load_fixture('ring_doorboot_health_attrs_id987653.json'))
+
+        dev = self.ring.doorbells[0]
+        created_at = dev.history(limit=1)[0]['created_at']
+        self.assertEqual(datetime(2017, 3, 5, 15, 3, 40),
+                         created_at.replace(tzinfo=None))
+        self.assertEqual(0, created_at.utcoffset().total_seconds())
+
+        created_at = dev.history(limit=1, timezone='America/New_York')[0][
+            'created_at']
+        self.assertEqual(datetime(2017, 3, 5, 10, 3, 40),
+                         created_at.replace(tzinfo=None))
+        self.assertEqual(-5 * 3600, created_at.utcoffset().total_seconds())
+
+    @requests_mock.Mocker()
+    def test_doorbell_recording_download(self, mock):
+        """Test recordings are written to disk or returned raw."""
+        mock.get('https://api.ring.com/clients_api/ring_devices',
+                 text=load_fixture('ring_devices.json'))
+        mock.get('https://api.ring.com/clients_api/doorbots/987652/health',
+                 text=load_fixture('ring_doorboot_health_attrs.json'))
+        mock.get('https://api.ring.com/clients_api/doorbots/987653/health',
+                 text=load_fixture('ring_doorboot_health_attrs_id987653.json'))
+        mock.get('https://api.ring.com/clients_api/dings/12345/recording',
+                 content=b'mp4 data')
+
+        dev = self.ring.doorbells[0]
+        with patch('requests.models.Response.close') as close:
+            self.assertEqual(b'mp4 data', dev.recording_download(12345))
+            self.assertEqual(1, close.call_count)
+
+        filename = os.path.join(tempfile.mkdtemp(), '12345.mp4')
+        self.assertTrue(dev.recording_download(12345, filename=filename))
+        with open(filename, 'rb') as recording:
+            self.assertEqual(b'mp4 data', recording.read())
+        self.assertFalse(dev.recording_download(12345, filename=filename))
+        shutil.rmtree(os.path.dirname(filename))
+
+    @requests_mock.Mocker()
+    def test_doorbell_recording_download_interrupted(self, mock):
+        """Test an interrupted download leaves no partial recording."""
+        mock.get('https://api.ring.com/clients_api/ring_devices',
+                 text=load_fixture('ring_devices.json'))
+        mock.get('https://api.ring.com/clients_api/doorbots/987652/health',
+                 text=load_fixture('ring_doorboot_health_attrs.json'))
+        mock.get('https://api.ring.com/clients_api/doorbots/987653/health',
+                 text=load_fixture('ring_doorboot_health_attrs_id987653.json'))
+        mock.get('https://api.ring.com/clients_api/dings/12345/recording',
+                 content=b'mp4 data')
+
+        def interrupted(*args, **kwargs):
+            """Yield a partial chunk then drop the connection."""
+            yield b'partial'
+            raise ChunkedEncodingError('connection dropped')
+
+        dev = self.ring.doorbells[0]
+        directory = tempfile.mkdtemp()
+        filename = os.path.join(directory, '12345.mp4')
+        with patch('requests.models.Response.iter_content', interrupted):
+            self.assertRaises(ChunkedEncodingError, dev.recording_download,
+                              12345, filename=filename)
+        self.assertEqual([], os.listdir(directory))
+
+        # a retry succeeds without needing to override a partial file
+        self.assertTrue(dev.recording_download(12345, filename=filename))
+        with open(filename, 'rb') as recording:
+            self.assertEqual(b'mp4 data', recording.read())
+        shutil.rmtree(directory)
+
+    @requests_mock.Mocker()
+    def test_doorbell_recording_download_many(self, mock):
+        """Test several recordings are downloaded into a directory."""
+        mock.get('https://api.ring.com/clients_api/ring_devices',
+                 text=load_fixture('ring_devices.json'))
+        mock.get('https://api.ring.com/clients_api/doorbots/987652/health',
+                 text=load_fixture('ring_doorboot_health_attrs.json'))
+        mock.get('https://api.ring.com/clients_api/doorbots/987653/health',
+                 text=load_fixture('ring_doorboot_health_attrs_id987653.json'))
+        for recording_id in (1, 2, 3):
+            mock.get('https://api.ring.com/clients_api/dings/{0}/recording'
+                     .format(recording_id),
+                     content='mp4 {0}'.format(recording_id).encode())
+
+        dev = self.ring.doorbells[0]
+        directory = tempfile.mkdtemp()
+        results = dev.recording_download_many([1, 2, 3], directory, workers=2)
+        self.assertEqual({1: True, 2: True, 3: True}, results)
+        for recording_id in (1, 2, 3):
+            filename = os.path.join(directory, '{0}.mp4'.format(recording_id))
+            with open(filename, 'rb') as recording:
+                self.assertEqual('mp4 {0}'.format(recording_id).encode(),
+                                 recording.read())
+
+        # duplicates are fetched once and workers is at least one
+        mock.reset_mock()
+        results = dev.recording_download_many([1, 1, 2], directory,
+                                              override=True, workers=0)
+        self.assertEqual({1: True, 2: True}, results)
+        recordings = [req for req in mock.request_history
+                      if req.path.endswith('/recording')]
+        self.assertEqual(2, len(recordings))
+        shutil.rmtree(directory)
+
+        # unexpected errors are reported per recording, not swallowed
+        results = dev.recording_download_many([1, 2], None)
+        self.assertEqual({1: False, 2: False}, results)
+
     @requests_mock.Mocker()
     def test_shared_doorbell_attributes(self, mock):
         mock.get('https://api.ring.com/clients_api/ring_devices',
@@ -122,6 +453,8 @@ class TestRing(RingUnitTestBase):
                 self.assertEqual('America/New_York', dev.timezone)
                 self.assertEqual(5, dev.volume)
                 self.assertEqual('Digital', dev.existing_doorbell_type)
+                self.assertTrue(dev.existing_doorbell_type_enabled)
+                self.assertEqual(3, dev.existing_doorbell_type_duration)
 
     @requests_mock.Mocker()
     def test_doorbell_alerts(self, mock):
@@ -193,3 +526,11 @@ class TestRing(RingUnitTestBase):
                 '/clients_api/doorbots/987652/siren_on',
                 history[3].path)
             self.assertEqual('30', history[3].qs['duration'][0])
+
+            # setter params are not kept for later queries
+            self.assertNotIn('duration', data.params)
+
+            # each write invalidates the cached device list
+            queries = [req for req in mock.request_history
+                       if req.path == '/clients_api/ring_devices']
+            self.assertEqual(5, len(queries))
@@ -1,6 +1,6 @@
 """The tests utils.py for the Ring platform."""
 import os
-import sys
+import pickle
 import unittest
 from ring_doorbell.utils import (
     _locator, _clean_cache, _exists_cache, _save_cache, _read_cache)
@@ -40,6 +40,27 @@ class TestUtils(unittest.TestCase):
         self.assertTrue(_exists_cache(CACHE))
         self.cleanup()
 
+    def leftovers(self):
+        """Return temporary cache files left in the tests directory."""
+        prefix = os.path.basename(CACHE) + '.'
+        return [name for name in os.listdir(os.path.dirname(CACHE))
+                if name.startswith(prefix) and name.endswith('.tmp')]
+
+    def test_save_cache_atomic(self):
+        """Test _save_cache does not leave its temporary file behind."""
+        self.assertTrue(_save_cache(DATA, CACHE))
+        self.assertEqual(self.leftovers(), [])
+        self.cleanup()
+
+    def test_save_cache_failure(self):
+        """Test a failed _save_cache keeps the previous cache intact."""
+        self.assertTrue(_save_cache(DATA, CACHE))
+        self.assertRaises(Exception, _save_cache, {'key': lambda: None}, CACHE)
+        self.assertEqual(self.leftovers(), [])
+        with open(CACHE, 'rb') as cache:
+            self.assertEqual(pickle.load(cache), DATA)
+        self.cleanup()
+
     def test_read_cache(self):
         """Test _read_cache method."""
         self.assertTrue(_save_cache(DATA, CACHE))
@@ -61,7 +82,4 @@ class TestUtils(unittest.TestCase):
     def test_general_exceptions(self):
         """Test exception triggers on utils.py"""
         self.assertRaises(TypeError, _clean_cache, True)
-        if sys.version_info.major == 2:
-            self.assertRaises(TypeError, _read_cache, True)
-        else:
-            self.assertRaises(OSError, _read_cache, True)
+        self.assertRaises(TypeError, _read_cache, True)